@@ -0,0 +1,155 @@
+"""
+Server-side conversation memory for /api/chat.
+
+Each conversation gets a ChatSession under a random, server-issued id that
+the client sends back with its next message; a session is only reachable by
+whoever holds its id. The most recent turns are kept
+verbatim up to a token budget; older turns are folded into a rolling summary
+that is itself capped. The prompt sent to the model therefore stays roughly
+the same size however long the conversation runs.
+
+Sessions live in memory with LRU eviction (by count and idle time).
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Rough token estimate (no tokenizer dependency): ~4 characters per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keeps the end of `text`, which holds the most recent context."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[-max_chars:]
+
+
+class ChatSession:
+    def __init__(self, book_title: str) -> None:
+        self.book_title = book_title
+        self.summary = ""
+        # Recent turns, verbatim: {"role": "user" | "assistant", "content": "..."}
+        self.turns: List[Dict[str, str]] = []
+        # Turns pushed out of `turns` that are not folded into `summary` yet
+        self.pending: List[Dict[str, str]] = []
+        self.folding = False
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class ChatMemory:
+    def __init__(
+        self,
+        history_token_budget: int,
+        summary_token_budget: int,
+        max_sessions: int,
+        idle_ttl_seconds: float,
+    ) -> None:
+        self.history_token_budget = history_token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str, book_title: str) -> Tuple[str, ChatSession]:
+        """
+        Returns `(session_id, session)`. An unknown or evicted id, or one
+        issued for another book, starts a new session with a fresh id, so
+        clients can never pick the id of a session themselves.
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None or session.book_title != book_title:
+                session_id = secrets.token_urlsafe(18)
+                session = ChatSession(book_title)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            self._evict(now)
+        return session_id, session
+
+    def _evict(self, now: float) -> None:
+        # Caller holds self._lock. Least recently used sessions are at the front.
+        while self._sessions:
+            session_id, oldest = next(iter(self._sessions.items()))
+            idle = now - oldest.last_used > self.idle_ttl_seconds
+            if not idle and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def build_messages(self, session: ChatSession, system_prompt: str, message: str) -> List[Dict[str, str]]:
+        """System prompt, then the summary and recent turns, then the new message."""
+        with session.lock:
+            messages = [{"role": "system", "content": system_prompt}]
+            if session.summary:
+                messages.append({
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {session.summary}",
+                })
+            messages.extend(session.pending)
+            messages.extend(session.turns)
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def record(self, session: ChatSession, message: str, reply: str) -> bool:
+        """
+        Appends one exchange and moves the oldest turns out of the verbatim
+        window once it exceeds the history budget. Returns True when there
+        are turns waiting to be folded into the summary.
+        """
+        with session.lock:
+            session.turns.append({"role": "user", "content": message})
+            session.turns.append({"role": "assistant", "content": reply})
+            total = sum(estimate_tokens(t["content"]) for t in session.turns)
+            # Always keep the latest exchange verbatim
+            while total > self.history_token_budget and len(session.turns) > 2:
+                turn = session.turns.pop(0)
+                total -= estimate_tokens(turn["content"])
+                session.pending.append(turn)
+            return bool(session.pending) and not session.folding
+
+    def fold(self, session: ChatSession, summarize: Callable[[str, List[Dict[str, str]]], str]) -> None:
+        """
+        Folds pending turns into the summary with `summarize(summary, turns)`.
+        The (slow) summarize call runs without holding the session lock so the
+        conversation is never blocked on it. If it fails, the turns are kept
+        as a truncated transcript instead. Turns that become pending while a
+        fold is running are picked up by another round before returning, so
+        `pending` never lingers until the next exchange.
+        """
+        with session.lock:
+            if session.folding or not session.pending:
+                return
+            session.folding = True
+
+        while True:
+            with session.lock:
+                summary = session.summary
+                turns = list(session.pending)
+
+            new_summary: Optional[str] = None
+            try:
+                new_summary = summarize(summary, turns)
+            except Exception as e:
+                print(f"Error summarizing chat history: {type(e).__name__}: {e}")
+            if not new_summary:
+                transcript = " ".join(f"{t['role']}: {t['content']}" for t in turns)
+                new_summary = f"{summary} {transcript}".strip()
+
+            with session.lock:
+                session.summary = truncate_to_tokens(new_summary.strip(), self.summary_token_budget)
+                del session.pending[:len(turns)]
+                if not session.pending:
+                    session.folding = False
+                    return
@@ -1,9 +1,11 @@
 import os
-from fastapi import FastAPI, HTTPException
+from typing import Dict, List
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from groq import Groq
 from dotenv import load_dotenv
+from chat_memory import ChatMemory, ChatSession
 
 # Load environment variables
 load_dotenv()
@@ -14,6 +16,17 @@ if not API_KEY:
 
 client = Groq(api_key=API_KEY)
 
+# Server-side chat history, keyed by a session id the server issues on the first
+# message (returned as `session_id`, sent back by the reader on the next one).
+# Recent turns stay verbatim within CHAT_HISTORY_TOKENS, older ones are folded
+# into a summary of at most CHAT_SUMMARY_TOKENS, so prompt size stays bounded.
+chat_memory = ChatMemory(
+    history_token_budget=int(os.getenv("CHAT_HISTORY_TOKENS", "1200")),
+    summary_token_budget=int(os.getenv("CHAT_SUMMARY_TOKENS", "250")),
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "1000")),
+    idle_ttl_seconds=int(os.getenv("CHAT_SESSION_IDLE_SECONDS", "3600")),
+)
+
 app = FastAPI()
 
 # CORS settings
@@ -38,9 +51,12 @@ class ChatRequest(BaseModel):
     book_title: str = ""
     current_page: int = 1
     total_pages: int = 0
+    # `session_id` from the previous response; empty starts a new conversation
+    session_id: str = ""
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: str
 
 class ImageRequest(BaseModel):
     prompt: str
@@ -121,8 +137,34 @@ Reject ANY content with:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def summarize_chat_turns(summary: str, turns: List[Dict[str, str]]) -> str:
+    """Merges older chat turns into the running conversation summary."""
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    response = client.chat.completions.create(
+        model="llama-3.1-8b-instant",
+        messages=[
+            {
+                "role": "system",
+                "content": "Update the summary of a conversation between a reader and a book assistant. "
+                           "Keep facts, questions asked and answers given. Reply with the summary only.",
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}",
+            },
+        ],
+        temperature=0.2,
+        max_tokens=chat_memory.summary_token_budget,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def fold_chat_history(session: ChatSession):
+    chat_memory.fold(session, summarize_chat_turns)
+
+
 @app.post("/api/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     try:
         print(f"Received chat request: {request.message[:50]}...")
         print(f"Book: {request.book_title}, Page: {request.current_page}")
@@ -131,21 +173,25 @@ async def chat(request: ChatRequest):
 The user is currently on page {request.current_page}{f' of {request.total_pages}' if request.total_pages > 0 else ''}. 
 Provide concise, relevant answers about the book's content, themes, characters, and context."""
 
+        session_id, session = chat_memory.get(request.session_id, request.book_title)
+        messages = chat_memory.build_messages(session, system_prompt, request.message)
+
         print("Calling Groq API...")
         response = client.chat.completions.create(
             model="llama-3.1-8b-instant",  # Using the same model as moderation
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": request.message},
-            ],
+            messages=messages,
             temperature=0.7,
             max_tokens=500,
         )
 
         ai_response = response.choices[0].message.content.strip()
         print(f"Got response: {ai_response[:50]}...")
+
+        # Summarize overflowing history after the response is sent, off the request path
+        if chat_memory.record(session, request.message, ai_response):
+            background_tasks.add_task(fold_chat_history, session)
         
-        return {"response": ai_response}
+        return {"response": ai_response, "session_id": session_id}
 
     except Exception as e:
         print(f"Error in chat endpoint: {type(e).__name__}: {str(e)}")
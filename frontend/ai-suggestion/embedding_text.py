@@ -0,0 +1,21 @@
+"""
+The text a book is embedded from. main.py embeds it for query vectors,
+ingest.py and import_catalog.py for the stored ones, so all three import
+it from here to keep the vectors comparable.
+"""
+from typing import Any, Dict
+
+
+def get_text_to_embed(book: Dict[str, Any]) -> str:
+    """
+    Creates a single descriptive string for a book, which is then
+    converted into a vector embedding by the SentenceTransformer model.
+    """
+    genres_list = book.get("genres", [])
+    genres_str = ", ".join(genres_list) if genres_list else ""
+    return (
+        f"Title: {book.get('title', '')}. "
+        f"Author: {book.get('author', '')}. "
+        f"Genre: {book.get('genre', '')}. "
+        f"Tags: {genres_str}."
+    )
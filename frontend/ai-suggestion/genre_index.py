@@ -0,0 +1,106 @@
+"""
+In-memory inverted index from genre to book ids.
+
+Used by the recommendation service for cold-start (preference based)
+candidates so that the hot path never has to run a `cs` containment
+query against `books.genres`.
+"""
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+class GenreIndex:
+    """
+    Maps every genre to the set of book ids tagged with it, and keeps the
+    small amount of per-book data needed to answer a recommendation
+    (title, author, cover and download count for ranking).
+
+    Not thread-safe: `upsert` mutates the posting sets in place. An index
+    that is being queried must not be written to from another thread;
+    build a fresh instance off-thread and swap the reference instead.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Set[Any]] = {}
+        self._books: Dict[Any, Dict[str, Any]] = {}
+        self._book_genres: Dict[Any, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    @staticmethod
+    def _normalize(genre: str) -> str:
+        return genre.strip().lower()
+
+    def upsert(self, book: Dict[str, Any]) -> None:
+        """Adds a book to the index, or replaces its previous entry."""
+        book_id = book.get("id")
+        if book_id is None:
+            return
+        genres = book.get("genres") or []
+        if not isinstance(genres, list):
+            genres = []
+        keys = sorted({self._normalize(g) for g in genres if g})
+
+        self._unlink(book_id)
+        for key in keys:
+            self._postings.setdefault(key, set()).add(book_id)
+        self._book_genres[book_id] = keys
+        self._books[book_id] = {
+            "id": book_id,
+            "title": book.get("title"),
+            "author": book.get("author"),
+            "cover_image": book.get("cover_image"),
+            "number_of_downloads": book.get("number_of_downloads") or 0,
+        }
+
+    def upsert_many(self, books: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for book in books:
+            self.upsert(book)
+            count += 1
+        return count
+
+    def _unlink(self, book_id: Any) -> None:
+        for key in self._book_genres.pop(book_id, []):
+            posting = self._postings.get(key)
+            if posting is None:
+                continue
+            posting.discard(book_id)
+            if not posting:
+                del self._postings[key]
+
+    def query(
+        self,
+        genres: List[str],
+        limit: int = 10,
+        exclude: Optional[Set[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` books matching any of `genres`.
+
+        Books are ranked by how many of the requested genres they carry
+        (so books matching all of them come first, as the old containment
+        query returned), then by number of downloads.
+        """
+        # De-duplicate after normalizing, or "Fiction" and "fiction" would count twice
+        keys = {self._normalize(g) for g in genres if g}
+        postings = [self._postings.get(key) for key in keys]
+        postings = [p for p in postings if p]
+        if not postings:
+            return []
+
+        candidates: Set[Any] = set().union(*postings)
+        if exclude:
+            candidates -= exclude
+        if not candidates:
+            return []
+
+        books = self._books
+
+        def rank(book_id: Any):
+            overlap = sum(1 for p in postings if book_id in p)
+            return (overlap, books[book_id]["number_of_downloads"])
+
+        top_ids = heapq.nlargest(limit, candidates, key=rank)
+        return [dict(books[book_id]) for book_id in top_ids]
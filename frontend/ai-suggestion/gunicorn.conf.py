@@ -0,0 +1,49 @@
+# Multi-worker deployment for the recommendation service.
+#
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# main.py is imported once in the master (preload_app), which loads the
+# SentenceTransformer model and builds the genre index before forking. Workers
+# then share those pages copy-on-write instead of each loading its own copy,
+# so the worker count can follow the core count rather than available memory.
+#
+# The genre index is only fully shared while no worker refreshes it: each
+# worker's periodic rebuild would read the whole catalog on its own and swap in
+# a private copy. So refresh is off by default here and the index is rebuilt on
+# a full restart or redeploy. Setting GENRE_INDEX_REFRESH_SECONDS opts back in.
+import gc
+import multiprocessing
+import os
+import sys
+
+# Tells main.py to build shared, read-mostly state at import time (in the master)
+os.environ.setdefault("SHARED_PRELOAD", "1")
+# Keep the preloaded genre index shared (see above)
+os.environ.setdefault("GENRE_INDEX_REFRESH_SECONDS", "0")
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+
+def when_ready(server):
+    from process_memory import format_memory_usage, read_memory_usage
+
+    # Move everything loaded so far out of the GC's reach. Otherwise each
+    # worker's collector writes to those objects' headers and un-shares the pages.
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Master preloaded, {format_memory_usage(read_memory_usage())}")
+
+
+def post_fork(server, worker):
+    import torch
+
+    # One worker per core: keep each worker's torch thread pool from spreading over all cores
+    torch.set_num_threads(int(os.environ.get("TORCH_THREADS_PER_WORKER", "1")))
+
+    app_module = sys.modules.get("main")
+    if app_module is not None:
+        app_module.reopen_clients_after_fork()
@@ -0,0 +1,252 @@
+"""
+Streaming bulk importer for Gutendex-style JSON catalog dumps.
+
+The dump is a JSON array of objects shaped like frontend/public/books-data.json
+(id, title, author, description, subjects, languages, coverUrl, pdfUrl,
+downloadCount).
+It is parsed incrementally, so memory stays flat regardless of dump size.
+Books are upserted into the configured store (STORAGE_BACKEND) in large
+batches. Books that are new to the store are embedded and upserted to
+Pinecone in the same pass, before their batch is written to the store.
+
+Usage:
+    python import_catalog.py ../public/books-data.json
+    python import_catalog.py dump.json --batch-size 2000 --no-embed
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from embedding_text import get_text_to_embed
+from storage import create_store
+
+READ_CHUNK_SIZE = 1 << 16
+# Largest single book entry the importer will buffer while looking for its end
+MAX_ELEMENT_SIZE = 1 << 24
+# Characters that may follow an array element in valid JSON
+ELEMENT_DELIMITERS = " \t\r\n,]"
+PINECONE_BATCH_SIZE = 100
+# Ids per "which of these already exist" lookup; keeps PostgREST URLs short
+EXISTING_LOOKUP_SIZE = 200
+
+
+def iter_json_array(
+    path: str, chunk_size: int = READ_CHUNK_SIZE, max_element_size: int = MAX_ELEMENT_SIZE
+) -> Iterator[Any]:
+    """
+    Yields the elements of a top-level JSON array one by one, reading the
+    file in `chunk_size` pieces instead of loading it whole. Anything that is
+    not a well-formed array (missing or doubled commas, trailing commas, data
+    after the closing bracket) raises ValueError, as does an element longer
+    than `max_element_size` characters, rather than pulling the rest of the
+    file into memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        # What comes next: "[", the "first" element or "]", an "element" after
+        # a comma, a "separator" (comma or "]"), or only whitespace when "done"
+        expect = "["
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    if expect == "done":
+                        return
+                    raise ValueError(f"{path}: unexpected end of file (unterminated JSON array)")
+                more = f.read(chunk_size)
+                eof = not more
+                buf, pos = more, 0
+                continue
+
+            char = buf[pos]
+            if expect == "done":
+                raise ValueError(f"{path}: unexpected data after the JSON array")
+            if expect == "[":
+                if char != "[":
+                    raise ValueError(f"{path}: expected a JSON array")
+                expect = "first"
+                pos += 1
+                continue
+            if char == "]" and expect in ("first", "separator"):
+                expect = "done"
+                pos += 1
+                continue
+            if expect == "separator":
+                if char != ",":
+                    raise ValueError(f"{path}: expected ',' or ']' after an array element")
+                expect = "element"
+                pos += 1
+                continue
+            if char in ",]":
+                raise ValueError(f"{path}: expected an array element, found '{char}'")
+
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+                # A value may be cut off by the end of the buffer and still decode
+                # (e.g. "12" of "12345", or "1." of "1.5e3"), so only trust it when
+                # it is followed by a delimiter, or there is nothing left to read.
+                complete = eof or (end < len(buf) and buf[end] in ELEMENT_DELIMITERS)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                if len(buf) - pos > max_element_size:
+                    raise ValueError(
+                        f"{path}: element longer than {max_element_size} characters (malformed JSON?)"
+                    )
+                more = f.read(chunk_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield element
+            expect = "separator"
+            pos = end
+            if pos >= chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def normalize_subjects(subjects: List[str]) -> List[str]:
+    """
+    Turns Library of Congress style subjects into flat genres:
+    "England -- Social life and customs -- Fiction" becomes
+    ["England", "Social life and customs", "Fiction"]. Duplicates are dropped,
+    first occurrence order is kept.
+    """
+    genres: Dict[str, str] = {}
+    for subject in subjects or []:
+        for part in str(subject).split("--"):
+            genre = part.strip().rstrip(".")
+            if genre and genre.lower() not in genres:
+                genres[genre.lower()] = genre
+    return list(genres.values())
+
+
+def to_book_row(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Maps one dump entry onto the `books` columns, or None if it has no id."""
+    book_id = entry.get("id")
+    if book_id is None:
+        return None
+    genres = normalize_subjects(entry.get("subjects") or [])
+    languages = entry.get("languages") or []
+    return {
+        "id": str(book_id),
+        "title": entry.get("title"),
+        "author": entry.get("author"),
+        "description": entry.get("description"),
+        "genre": genres[0] if genres else None,
+        "genres": genres,
+        "language": languages[0] if languages else None,
+        "cover_image": entry.get("coverUrl"),
+        "pdf_file": entry.get("pdfUrl"),
+        "number_of_downloads": entry.get("downloadCount") or 0,
+    }
+
+
+class Embedder:
+    """Encodes books in batches and upserts the vectors to Pinecone."""
+
+    def __init__(self, batch_size: int) -> None:
+        # Imported here so `--no-embed` imports need neither the model nor Pinecone
+        from pinecone import Pinecone
+        from sentence_transformers import SentenceTransformer
+
+        pinecone_api_key = os.environ.get("PINECONE_API_KEY")
+        if not pinecone_api_key:
+            raise RuntimeError("PINECONE_API_KEY is required to embed books (or pass --no-embed).")
+        self.batch_size = batch_size
+        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.index = Pinecone(api_key=pinecone_api_key).Index("nextchapter-books")
+
+    def embed(self, books: List[Dict[str, Any]]) -> int:
+        if not books:
+            return 0
+        vectors = self.model.encode(
+            [get_text_to_embed(book) for book in books],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        payload = [
+            {
+                "id": book["id"],
+                "values": vector.tolist(),
+                "metadata": {
+                    "genre": book.get("genre") or "Unknown",
+                    "author": book.get("author") or "Unknown",
+                },
+            }
+            for book, vector in zip(books, vectors)
+        ]
+        for i in range(0, len(payload), PINECONE_BATCH_SIZE):
+            self.index.upsert(vectors=payload[i:i + PINECONE_BATCH_SIZE])
+        return len(payload)
+
+
+def run_import(path: str, batch_size: int, embedder: Optional[Embedder], reembed: bool) -> None:
+    store = create_store()
+    start_time = time.time()
+    imported = embedded = skipped = 0
+
+    def flush(batch: List[Dict[str, Any]]) -> None:
+        nonlocal imported, embedded
+        to_embed = batch
+        if embedder and not reembed:
+            ids = [book["id"] for book in batch]
+            existing = {
+                str(book["id"])
+                for i in range(0, len(ids), EXISTING_LOOKUP_SIZE)
+                for book in store.get_books(ids[i:i + EXISTING_LOOKUP_SIZE])
+            }
+            to_embed = [book for book in batch if book["id"] not in existing]
+        # Embed before writing to the store: "new" means "not in the store yet",
+        # so a batch whose embedding fails must stay new for the next run.
+        if embedder:
+            embedded += embedder.embed(to_embed)
+        store.upsert_books(batch)
+        imported += len(batch)
+        rate = imported / max(time.time() - start_time, 1e-6)
+        print(f"Imported {imported} books ({embedded} embedded, {rate:.0f} books/s)")
+
+    batch: List[Dict[str, Any]] = []
+    for entry in iter_json_array(path):
+        row = to_book_row(entry) if isinstance(entry, dict) else None
+        if row is None:
+            skipped += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    print(
+        f"Import complete: {imported} books, {embedded} embedded, {skipped} skipped "
+        f"in {time.time() - start_time:.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import a Gutendex-style JSON dump into the books store.")
+    parser.add_argument("path", help="Path to the JSON dump (a top-level array of books)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Books per store upsert (default: 1000)")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Books per encoder batch (default: 64)")
+    parser.add_argument("--no-embed", action="store_true", help="Only write to the store, skip Pinecone")
+    parser.add_argument("--reembed", action="store_true", help="Embed every imported book, not only new ones")
+    args = parser.parse_args()
+
+    load_dotenv()
+    embedder = None if args.no_embed else Embedder(args.embed_batch_size)
+    run_import(args.path, args.batch_size, embedder, args.reembed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,19 @@
 import os
-from supabase import create_client, Client
 from pinecone import Pinecone, ServerlessSpec
 from dotenv import load_dotenv
 import time
 from sentence_transformers import SentenceTransformer # <-- NEW IMPORT
+from embedding_text import get_text_to_embed
+from storage import create_store
 
 # --- 1. Load Environment & Initialize Clients ---
 load_dotenv() 
 
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
 # GROQ_API_KEY is not needed for ingestion
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+# Supabase by default, or local SQLite with STORAGE_BACKEND=sqlite
+store = create_store()
 pc = Pinecone(api_key=PINECONE_API_KEY)
 
 # --- NEW: Load local embedding model ---
@@ -39,22 +39,10 @@ pc.create_index(
 )
 index = pc.Index(index_name)
 
-# --- 3. Helper Functions ---
-def get_text_to_embed(book):
-    """Combines book fields into a single string for embedding."""
-    genres_list = book.get('genres', [])
-    genres_str = ", ".join(genres_list) if genres_list else ""
-    
-    return f"Title: {book.get('title', '')}. " \
-           f"Author: {book.get('author', '')}. " \
-           f"Genre: {book.get('genre', '')}. " \
-           f"Tags: {genres_str}."
-
-# --- 4. Main Ingestion Function ---
+# --- 3. Main Ingestion Function ---
 def run_ingestion():
-    print("Fetching books from Supabase...")
-    response = supabase.table('books').select('id, title, author, genre, genres').execute()
-    books = response.data
+    print(f"Fetching books from {type(store).__name__}...")
+    books = [book for page in store.iter_catalog() for book in page]
     
     if not books:
         print("No books found to ingest.")
@@ -97,6 +85,6 @@ def run_ingestion():
     
     print("Ingestion complete!")
 
-# --- 5. Run it ---
+# --- 4. Run it ---
 if __name__ == "__main__":
     run_ingestion()
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Load-control helpers for the recommendation service.
+
+- SingleFlight: concurrent requests for the same key share one computation.
+- AdmissionGate: a concurrency limit that refuses work instead of queueing it,
+  so a saturated encoder or vector store turns into a fast fallback rather
+  than a pile of requests waiting to time out.
+"""
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed because a dependency has no free capacity."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls by key. The first caller starts the work as a
+    task; everyone arriving while it is still running awaits the same task.
+    The key is forgotten as soon as the task finishes, so results are never
+    served stale.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Returns the in-flight task for `key`, starting `fn()` if there is none."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # shield(): one caller hitting its deadline must not cancel the
+        # computation for the other callers sharing it.
+        return await asyncio.shield(self.start(key, fn))
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter gave up early.
+        if not task.cancelled():
+            task.exception()
+
+
+class AdmissionGate:
+    """
+    Non-blocking concurrency limit for one dependency (e.g. the encoder).
+    Only used from the event loop thread, so a plain counter is enough.
+    """
+
+    def __init__(self, name: str, limit: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.in_use = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_use >= self.limit
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        if self.saturated:
+            raise Overloaded(f"{self.name} is saturated ({self.in_use}/{self.limit} in use)")
+        self.in_use += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
@@ -1,35 +1,44 @@
 #Author - Kirtan Chhatbar - 202301098
+import asyncio
 import os
+import secrets
 import time
 from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pinecone import Pinecone
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sentence_transformers import SentenceTransformer
-from supabase import Client, create_client
 import uvicorn
-from postgrest.exceptions import APIError
+
+from embedding_text import get_text_to_embed
+from genre_index import GenreIndex
+from load_control import AdmissionGate, Overloaded, SingleFlight
+from pagination import RankedResultCache, decode_cursor, encode_cursor
+from process_memory import format_memory_usage, read_memory_usage
+from storage import BookStore, create_store
 
 
 # --- 1. Load Environment & Initialize Clients ---
 load_dotenv() 
 
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
 
 # Check if all required environment variables are set
-if not all([SUPABASE_URL, SUPABASE_SERVICE_KEY, PINECONE_API_KEY]):
+if not PINECONE_API_KEY:
     raise RuntimeError("Missing one or more required environment variables for recommendation service.")
 
 # Initialize the FastAPI app
 app = FastAPI(title="NextChapter AI Suggestions API")
 
-# Initialize Supabase client (using service_role key to bypass RLS)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+# Initialize the data store (Supabase by default, or local SQLite with STORAGE_BACKEND=sqlite)
+store: BookStore = create_store()
+
+# Set by gunicorn.conf.py: this module is imported once in the master process and the
+# workers are forked from it, so state built at import time is shared copy-on-write.
+SHARED_PRELOAD = os.environ.get("SHARED_PRELOAD") == "1"
 
 # Initialize Pinecone client
 pc = Pinecone(api_key=PINECONE_API_KEY)
@@ -44,7 +53,47 @@ EMBEDDING_DIMENSION = 384 # Dimensions of the 'all-MiniLM-L6-v2' model
 # Connect to the Pinecone index where book vectors are stored
 index = pc.Index("nextchapter-books")
 
-print("Clients (Supabase, Pinecone, SentenceTransformer) initialized.")
+print(f"Clients ({type(store).__name__}, Pinecone, SentenceTransformer) initialized.")
+
+# In-memory genre -> book ids index used for preference-based (cold start) recommendations.
+# It is built from the catalog on startup, then rebuilt every GENRE_INDEX_REFRESH_SECONDS
+# (0 disables) so new books, edited genres, download counts and deletions all show up.
+# Under gunicorn every worker would run its own refresh, each reading the whole catalog
+# and replacing the preloaded (shared) index with a private copy, so gunicorn.conf.py
+# defaults this to 0: the index stays shared and is rebuilt on restart or redeploy.
+genre_index = GenreIndex()
+GENRE_INDEX_PAGE_SIZE = 1000
+GENRE_INDEX_REFRESH_SECONDS = int(os.environ.get("GENRE_INDEX_REFRESH_SECONDS", "300"))
+
+# --- Load control ---
+# Identical in-flight requests share one computation, every request has a latency
+# deadline, and the encoder / vector store only accept a bounded number of concurrent
+# calls. Anything over budget gets the cached 'popular' list instead of queueing.
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "3.0"))
+POPULAR_CACHE_TTL_SECONDS = int(os.environ.get("POPULAR_CACHE_TTL_SECONDS", "300"))
+encoder_gate = AdmissionGate("encoder", int(os.environ.get("ENCODER_MAX_CONCURRENCY", "2")))
+vector_store_gate = AdmissionGate("vector store", int(os.environ.get("VECTOR_STORE_MAX_CONCURRENCY", "8")))
+request_coalescer = SingleFlight()
+_popular_cache: Dict[str, Any] = {"books": [], "fetched_at": 0.0}
+
+# --- Pagination ---
+# Each feed is ranked once (up to RESULT_POOL_SIZE books) and held in this process for
+# RESULT_CACHE_TTL_SECONDS, one compact entry per feed and user; further pages are
+# slices addressed by an opaque cursor.
+# The cursor also carries the remaining ranked ids, so a page landing on another
+# worker is rebuilt with one book lookup instead of failing. Cursors are signed with
+# CURSOR_SECRET; without it a random key is made at import, which preloaded gunicorn
+# workers share, but separate processes or hosts do not (set CURSOR_SECRET there).
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 50
+RESULT_POOL_SIZE = int(os.environ.get("RESULT_POOL_SIZE", "100"))
+CURSOR_KEY = (
+    os.environ["CURSOR_SECRET"].encode() if os.environ.get("CURSOR_SECRET") else secrets.token_bytes(32)
+)
+ranked_results = RankedResultCache(
+    ttl_seconds=int(os.environ.get("RESULT_CACHE_TTL_SECONDS", "300")),
+    max_entries=int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "1000")),
+)
 
 # --- 2. CORS Middleware ---
 # Configure Cross-Origin Resource Sharing (CORS)
@@ -69,6 +118,8 @@ app.add_middleware(
 class RecommendationRequest(BaseModel):
     """Defines the expected JSON body for a POST request."""
     user_id: str
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    cursor: Optional[str] = None
 
 class RecommendedBook(BaseModel):
     """Defines the shape of a single book in the response."""
@@ -83,23 +134,11 @@ class RecommendationResponse(BaseModel):
     books: List[RecommendedBook]
     strategy: Optional[str] = None
     is_fallback: bool = False
+    # Pass back as `cursor` to get the next page; None on the last page
+    next_cursor: Optional[str] = None
 
 # --- 4. Helper Functions ---
 
-def get_text_to_embed(book: Dict[str, Any]) -> str:
-    """
-    Creates a single descriptive string for a book, which is then
-    converted into a vector embedding by the SentenceTransformer model.
-    """
-    genres_list = book.get("genres", [])
-    genres_str = ", ".join(genres_list) if genres_list else ""
-    return (
-        f"Title: {book.get('title', '')}. "
-        f"Author: {book.get('author', '')}. "
-        f"Genre: {book.get('genre', '')}. " 
-        f"Tags: {genres_str}."
-    )
-
 def calculate_love_score(history_item: Dict[str, Any]) -> float:
     """
     Calculates a "Love Score" (from 0 to 1) based on user's interaction
@@ -119,11 +158,12 @@ def calculate_love_score(history_item: Dict[str, Any]) -> float:
 
 def format_books(raw_books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Takes a list of book objects from Supabase and formats them
+    Takes a list of book objects from the store and formats them
     into the simple structure required by the `RecommendedBook` model.
+    Pagination happens later, so every book is kept, in order.
     """
     formatted = []
-    for book in raw_books[:5]: # Return only the top 5
+    for book in raw_books:
         formatted.append(
             {
                 "book_id": book.get("id"),
@@ -134,98 +174,127 @@ def format_books(raw_books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         )
     return formatted
 
-async def get_popular_books_from_supabase() -> List[Dict[str, Any]]:
+def compact_books(books: List[RecommendedBook]) -> tuple:
+    """Plain tuples of the ranked books, for the per-worker result cache."""
+    return tuple((b.book_id, b.title, b.author, b.cover_url) for b in books)
+
+def expand_books(rows: tuple) -> List[RecommendedBook]:
+    return [
+        RecommendedBook(book_id=book_id, title=title, author=author, cover_url=cover_url)
+        for book_id, title, author, cover_url in rows
+    ]
+
+async def get_popular_books_from_store() -> List[Dict[str, Any]]:
     """
-    The final fallback. Tries to get popular books by calling a
-    PostgreSQL RPC function 'get_popular_books'. If that fails,
-    it runs a manual query to get books ordered by 'number_of_downloads'.
+    The final fallback: the most downloaded books in the catalog.
     """
     try:
-        # First, try calling the database function
-        response = supabase.rpc("get_popular_books", {}).execute()
-        if response.data:
-            return response.data
-        print("RPC 'get_popular_books' returned no data. Using fallback query.")
-    except APIError as e:
-        # This catches errors if the RPC function doesn't exist or fails
-        if e.code == "PGRST202" or e.code == "42883" or e.code == "42703":
-            print(f"RPC 'get_popular_books' failed or not found ({e.code}). Using fallback query.")
-        else:
-            print(f"Error calling get_popular_books RPC: {e}")
+        return await asyncio.to_thread(store.get_popular_books, RESULT_POOL_SIZE)
     except Exception as e:
-        print(f"A general error occurred in get_popular_books: {e}")
-    
-    # Manual fallback query if the RPC fails
+        print(f"Error fetching popular books: {e}")
+        return []
+
+async def refresh_popular_cache() -> List[Dict[str, Any]]:
+    books = await get_popular_books_from_store()
+    if books:
+        _popular_cache["books"] = books
+        _popular_cache["fetched_at"] = time.time()
+    return books or _popular_cache["books"]
+
+async def get_popular_books_cached() -> List[Dict[str, Any]]:
+    """
+    Popular books change slowly, so they are kept in memory. A stale copy is
+    always served immediately while one coalesced background refresh runs, so
+    the shed-load fallback never waits on the store. Only a cold (empty) cache
+    waits, and then at most REQUEST_DEADLINE_SECONDS.
+    """
+    if _popular_cache["books"]:
+        if time.time() - _popular_cache["fetched_at"] >= POPULAR_CACHE_TTL_SECONDS:
+            request_coalescer.start(("popular",), refresh_popular_cache)
+        return _popular_cache["books"]
     try:
-        fallback_response = (
-            supabase.table("books")
-            .select("id, title, author, cover_image")
-            .order("number_of_downloads", desc=True, nullsfirst=False)
-            .limit(10)
-            .execute()
+        return await asyncio.wait_for(
+            request_coalescer.do(("popular",), refresh_popular_cache), timeout=REQUEST_DEADLINE_SECONDS
         )
-        return fallback_response.data or []
-    except Exception as e:
-        print(f"Error fetching popular books via fallback: {e}")
+    except asyncio.TimeoutError:
+        print(f"Popular books not available within {REQUEST_DEADLINE_SECONDS}s.")
         return []
 
-async def get_recs_from_preferences(user_id: str) -> Optional[List[Dict[str, Any]]]:
+def load_genre_index() -> GenreIndex:
+    """Pages through the whole catalog and returns a freshly built genre index."""
+    new_index = GenreIndex()
+    for page in store.iter_catalog(page_size=GENRE_INDEX_PAGE_SIZE):
+        new_index.upsert_many(page)
+    return new_index
+
+async def refresh_genre_index_forever() -> None:
+    """
+    Background task: rebuilds the index every GENRE_INDEX_REFRESH_SECONDS.
+    The new index is built in a worker thread and swapped in whole, so
+    requests never see (or race with) a half-updated index.
+    """
+    global genre_index
+    while True:
+        await asyncio.sleep(GENRE_INDEX_REFRESH_SECONDS)
+        try:
+            genre_index = await asyncio.to_thread(load_genre_index)
+            print(f"Genre index rebuilt with {len(genre_index)} books.")
+        except Exception as e:
+            print(f"Error refreshing genre index: {e}")
+
+def build_genre_index_now() -> None:
+    global genre_index
+    start_build = time.time()
+    try:
+        genre_index = load_genre_index()
+        print(f"Genre index built with {len(genre_index)} books in {time.time() - start_build:.2f}s")
+    except Exception as e:
+        print(f"Error building genre index: {e}. Preference-based recommendations will be empty until the next refresh.")
+
+@app.on_event("startup")
+async def build_genre_index() -> None:
+    # With SHARED_PRELOAD the index was already built in the master before forking
+    if not len(genre_index):
+        await asyncio.to_thread(build_genre_index_now)
+    if GENRE_INDEX_REFRESH_SECONDS > 0:
+        asyncio.create_task(refresh_genre_index_forever())
+
+if SHARED_PRELOAD:
+    build_genre_index_now()
+
+async def get_recs_from_preferences(
+    user_id: str, exclude: Optional[set] = None
+) -> Optional[List[Dict[str, Any]]]:
     """
     This is Plan B (for Cold Starts or Warm Start fallbacks).
     It fetches the user's saved 'genres' from their 'user_profiles'
-    table and finds books that match.
+    table and finds matching books in the in-memory genre index,
+    ranked by genre overlap and then popularity.
     """
     try:
-        profile_res = (
-            supabase.table("user_profiles")
-            .select("genres")
-            .eq("user_id", user_id)
-            .maybe_single()
-            .execute()
-        )
-        
-        if not profile_res or not profile_res.data or not profile_res.data.get("genres"):
-            print(f"User {user_id} has no preferences saved.")
-            return None
-            
-        preferred_genres = profile_res.data["genres"]
+        preferred_genres = await asyncio.to_thread(store.get_user_genres, user_id)
         if not preferred_genres:
+            print(f"User {user_id} has no preferences saved.")
             return None
-            
+
         print(f"User {user_id} has preferred genres: {preferred_genres}")
-        
-        # --- FIX: Convert Python list to PostgreSQL array string ---
-        # e.g., ['Fiction', 'History'] becomes '{"Fiction","History"}'
-        postgres_array_string = "{" + ",".join(f'"{g}"' for g in preferred_genres) + "}"
-        
-        book_res = (
-            supabase.table("books")
-            .select("id, title, author, cover_image")
-            # Use the correctly formatted string
-            .filter("genres", "cs", postgres_array_string) # 'cs' = "contains"
-            .limit(10)
-            .execute()
-        )
-        return book_res.data if book_res.data else None
-    except APIError as e:
-        if e.code == "PGRST116":
-             print(f"No profile found for user {user_id}. Cannot get preferences.")
-             return None
-        print(f"Error fetching preference-based recommendations: {e}")
-        return None
+
+        books = genre_index.query(preferred_genres, limit=RESULT_POOL_SIZE, exclude=exclude)
+        return books or None
     except Exception as e:
         print(f"A general error occurred in get_recs_from_preferences: {e}")
         return None
 
-# --- 5. Main Logic (REPLACED WITH NEW RPC CALL) ---
+# --- 5. Main Logic ---
 
 async def build_recommendations_payload(user_id: str) -> RecommendationResponse:
     """
     This is the main function that builds the recommendation response.
     It handles both "Cold Start" (new users) and "Warm Start" (returning users).
+    The response holds the full ranked list; endpoints page through it.
     
-    This version uses the 'get_full_user_history' RPC call to join data
-    from user_books, book_ratings, and book_wishlist.
+    The store's user history joins data from user_books, book_ratings,
+    and book_wishlist in one call.
     """
     start_total_time = time.time()
     print(f"Generating recommendations for {user_id}")
@@ -233,14 +302,8 @@ async def build_recommendations_payload(user_id: str) -> RecommendationResponse:
     
     try:
         # --- Step 1: Get ALL history data in ONE call ---
-        # This one RPC call replaces all our old, broken queries
         start_step_time = time.time()
-        history_res = (
-            supabase.rpc("get_full_user_history", {"p_user_id": user_id})
-            .execute()
-        )
-        
-        all_history_data = history_res.data or []
+        all_history_data = await asyncio.to_thread(store.get_user_history, user_id)
         
         # --- Step 2: Get ALL "read" book IDs for accurate filtering ---
         read_book_ids = set(item['book_id'] for item in all_history_data) if all_history_data else set()
@@ -257,11 +320,11 @@ async def build_recommendations_payload(user_id: str) -> RecommendationResponse:
             print(f"Cold start detected for user: {user_id}")
             
             # Plan A: Try to get recommendations from their saved preferences
-            preferred = await get_recs_from_preferences(user_id)
+            preferred = await get_recs_from_preferences(user_id, exclude=read_book_ids)
             strategy = "preferences" if preferred else "popular"
             
             # Plan B: If no preferences, get popular books
-            candidate_books_raw = preferred or await get_popular_books_from_supabase()
+            candidate_books_raw = preferred or await get_popular_books_cached()
             
             # Filter out any books they *may* have read (from all_history_res)
             candidate_books = [b for b in candidate_books_raw if b.get('id') not in read_book_ids]
@@ -294,13 +357,7 @@ async def build_recommendations_payload(user_id: str) -> RecommendationResponse:
             scored_books_history.append({"book_id": item["book_id"], "score": score})
         
         recent_book_ids = [b["book_id"] for b in scored_books_history]
-        books_response = (
-            supabase.table("books")
-            .select("id, title, author, genres, language")
-            .in_("id", recent_book_ids)
-            .execute()
-        )
-        books_response_data = books_response.data or []
+        books_response_data = await asyncio.to_thread(store.get_books, recent_book_ids, True)
         print(f"   [TIMING] Scored & fetched history book details: {time.time() - start_step_time:.2f}s")
 
         # Calculate weighted scores for genres, authors, and languages
@@ -333,22 +390,27 @@ async def build_recommendations_payload(user_id: str) -> RecommendationResponse:
         # --- Step 5b: Generate Query Vector ---
         start_step_time = time.time()
         query_text = get_text_to_embed(top_book_details)
-        query_vector = embedding_model.encode(query_text).tolist()
+        with encoder_gate.admit():
+            query_vector = (await asyncio.to_thread(embedding_model.encode, query_text)).tolist()
         print(f"   [TIMING] Generated query vector (encode): {time.time() - start_step_time:.2f}s")
 
         # --- Step 5c: Query Pinecone (Vector Search) ---
         start_step_time = time.time()
         pinecone_filter = {} 
-        query_results = index.query(
-            vector=query_vector,
-            top_k=8,
-            include_metadata=True,
-            filter=pinecone_filter if pinecone_filter else None,
-        )
+        # Ask for enough neighbours to fill the pool after dropping already-read books
+        top_k = min(RESULT_POOL_SIZE + len(read_book_ids), 1000)
+        with vector_store_gate.admit():
+            query_results = await asyncio.to_thread(
+                index.query,
+                vector=query_vector,
+                top_k=top_k,
+                include_metadata=True,
+                filter=pinecone_filter if pinecone_filter else None,
+            )
         print(f"   [TIMING] Queried Pinecone: {time.time() - start_step_time:.2f}s")
 
         # Use the *complete* list of read_book_ids to filter the results
-        similar_book_ids = [m["id"] for m in query_results["matches"] if m["id"] not in read_book_ids][:5]
+        similar_book_ids = [m["id"] for m in query_results["matches"] if m["id"] not in read_book_ids][:RESULT_POOL_SIZE]
 
         # --- Step 5d: Handle Fallback Logic ---
         candidate_books: List[Dict[str, Any]] = []
@@ -356,19 +418,16 @@ async def build_recommendations_payload(user_id: str) -> RecommendationResponse:
         
         if not similar_book_ids:
             print("Vector search produced no unseen titles. Falling back to preferences/popular.")
-            prefs = await get_recs_from_preferences(user_id)
+            prefs = await get_recs_from_preferences(user_id, exclude=read_book_ids)
             strategy = "preferences" if prefs else "popular"
-            candidate_books_raw = prefs or await get_popular_books_from_supabase()
+            candidate_books_raw = prefs or await get_popular_books_cached()
             candidate_books = [b for b in candidate_books_raw if b.get('id') not in read_book_ids]
         else:
             start_step_time = time.time()
-            final_books_response = (
-                supabase.table("books")
-                .select("id, title, author, cover_image")
-                .in_("id", similar_book_ids)
-                .execute()
-            )
-            candidate_books = final_books_response.data or []
+            found_books = await asyncio.to_thread(store.get_books, similar_book_ids)
+            # The store returns rows in arbitrary order; restore similarity ranking
+            books_by_id = {str(b.get("id")): b for b in found_books}
+            candidate_books = [books_by_id[i] for i in similar_book_ids if i in books_by_id]
             print(f"   [TIMING] Fetched final book details: {time.time() - start_step_time:.2f}s")
 
         # --- Step 6: Format and Return ---
@@ -384,58 +443,25 @@ async def build_recommendations_payload(user_id: str) -> RecommendationResponse:
             is_fallback=strategy != "vector_search",
         )
 
-    except HTTPException:
-        raise 
+    except (HTTPException, Overloaded):
+        raise
     except Exception as e:
         print(f"An error occurred in recommendation generation: {e}")
         raise HTTPException(status_code=500, detail="An internal server error occurred.")
 
 
-async def build_explore_payload(user_id: str, limit: int = 5) -> RecommendationResponse:
-    """Return curated books the user has not read yet."""
+async def build_explore_payload(user_id: str) -> RecommendationResponse:
+    """Return curated books the user has not read yet, most downloaded first."""
     if not user_id:
         raise HTTPException(status_code=400, detail="Missing user_id.")
 
     try:
-        read_response = (
-            supabase.table("user_books")
-            .select("book_id")
-            .eq("user_id", user_id)
-            .execute()
-        )
-        read_ids = {
-            row.get("book_id")
-            for row in (read_response.data or [])
-            if row.get("book_id") is not None
-        }
+        read_ids = await asyncio.to_thread(store.get_read_book_ids, user_id)
+        # Scan deep enough that the pool is still full after dropping read books
+        window = RESULT_POOL_SIZE + len(read_ids)
+        top_books = await asyncio.to_thread(store.get_top_books, window)
 
-        try:
-            books_response = (
-                supabase.table("books")
-                .select("id, title, author, cover_image")
-                .order("number_of_downloads", desc=True, nullsfirst=False)
-                .limit(60)
-                .execute()
-            )
-        except APIError as e:
-            if e.code != "42703":
-                raise
-            # Fallback to created_at if number_of_downloads column does not exist
-            books_response = (
-                supabase.table("books")
-                .select("id, title, author, cover_image")
-                .order("created_at", desc=True, nullsfirst=False)
-                .limit(60)
-                .execute()
-            )
-
-        candidate_books: List[Dict[str, Any]] = []
-        for book in books_response.data or []:
-            if book.get("id") in read_ids:
-                continue
-            candidate_books.append(book)
-            if len(candidate_books) >= limit:
-                break
+        candidate_books = [b for b in top_books if b.get("id") not in read_ids][:RESULT_POOL_SIZE]
 
         if not candidate_books:
             raise HTTPException(status_code=404, detail="No explore titles available. Try again later.")
@@ -457,41 +483,191 @@ async def build_explore_payload(user_id: str, limit: int = 5) -> RecommendationR
         raise HTTPException(status_code=500, detail="Unable to fetch explore recommendations.")
 
 
+@app.on_event("startup")
+async def warm_popular_cache() -> None:
+    # Prime the cache so the very first shed request is answered without a DB round trip
+    await get_popular_books_cached()
+
+async def build_popular_fallback(user_id: str) -> RecommendationResponse:
+    """
+    The degraded response served when a request is shed or runs out of time.
+    It is deliberately store-free, so unlike the other popular paths it does
+    not filter out books the user has already read.
+    """
+    formatted = format_books(await get_popular_books_cached())
+    if not formatted:
+        raise HTTPException(status_code=503, detail="Service is busy. Please try again shortly.")
+    return RecommendationResponse(
+        user_id=user_id,
+        books=[RecommendedBook(**book) for book in formatted],
+        strategy="popular",
+        is_fallback=True,
+    )
+
+async def run_with_load_control(key: tuple, user_id: str, build) -> Optional[Any]:
+    """
+    Runs `build()` once per distinct in-flight `key`, bounded by
+    REQUEST_DEADLINE_SECONDS. Returns None if the request was shed or ran late.
+    """
+    try:
+        return await asyncio.wait_for(
+            request_coalescer.do(key, build), timeout=REQUEST_DEADLINE_SECONDS
+        )
+    except Overloaded as e:
+        print(f"Shedding {key[0]} request for {user_id}: {e}")
+    except asyncio.TimeoutError:
+        print(f"{key[0]} request for {user_id} exceeded {REQUEST_DEADLINE_SECONDS}s deadline.")
+    return None
+
+
+async def serve_page(
+    kind: str, user_id: str, limit: int, cursor: Optional[str], build
+) -> RecommendationResponse:
+    """
+    Returns one page of a feed. Without a cursor the feed is ranked (through
+    load control, falling back to popular books) and cached. With a cursor the
+    cached ranking is sliced, or, if this process does not hold it, the page is
+    looked up from the ids the cursor carries, under the same deadline.
+    """
+    if cursor:
+        try:
+            state = decode_cursor(cursor, CURSOR_KEY)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if state["kind"] != kind or state["user_id"] != user_id:
+            raise HTTPException(status_code=400, detail="Cursor does not belong to this feed.")
+        token, offset = state["token"], state["offset"]
+        strategy, is_fallback = state["strategy"], state["is_fallback"]
+        remaining_ids = state["ids"]
+        cached = ranked_results.get(token, kind, user_id)
+        if cached is not None:
+            books = expand_books(cached[offset:offset + limit])
+        else:
+            page_ids = remaining_ids[:limit]
+            found_books = await run_with_load_control(
+                (kind, user_id, token, offset, limit), user_id,
+                lambda: asyncio.to_thread(store.get_books, page_ids),
+            )
+            if found_books is None:
+                # The cursor stays valid, so the client can simply retry this page
+                raise HTTPException(status_code=503, detail="Service is busy. Please try again shortly.")
+            books_by_id = {str(b.get("id")): b for b in found_books}
+            books = [
+                RecommendedBook(**book)
+                for book in format_books([books_by_id[str(i)] for i in page_ids if str(i) in books_by_id])
+            ]
+    else:
+        ranked = await run_with_load_control((kind, user_id), user_id, build)
+        if ranked is None:
+            ranked = await build_popular_fallback(user_id)
+        token, offset = None, 0
+        strategy, is_fallback = ranked.strategy, ranked.is_fallback
+        remaining_ids = [book.book_id for book in ranked.books]
+        books = ranked.books[:limit]
+
+    next_cursor = None
+    if len(remaining_ids) > limit:
+        if token is None:
+            token = ranked_results.put(kind, user_id, compact_books(ranked.books))
+        next_cursor = encode_cursor({
+            "token": token,
+            "offset": offset + limit,
+            "kind": kind,
+            "user_id": user_id,
+            "strategy": strategy,
+            "is_fallback": is_fallback,
+            "ids": remaining_ids[limit:],
+        }, CURSOR_KEY)
+
+    return RecommendationResponse(
+        user_id=user_id,
+        books=books,
+        strategy=strategy,
+        is_fallback=is_fallback,
+        next_cursor=next_cursor,
+    )
+
+
+def reopen_clients_after_fork() -> None:
+    """
+    Called in each worker right after fork (gunicorn post_fork). The model and
+    genre index stay shared, but the store and Pinecone clients (and any
+    connections they hold) must not be.
+    """
+    global store, pc, index
+    store = create_store()
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = pc.Index("nextchapter-books")
+
+@app.on_event("startup")
+async def log_worker_memory() -> None:
+    print(f"Worker ready, {format_memory_usage(read_memory_usage())}")
+
+
 # --- 6. Main Recommendation Endpoints ---
 
 @app.get("/recommendations/{user_id}", response_model=RecommendationResponse)
-async def get_smart_suggestions(user_id: str):
+async def get_smart_suggestions(
+    user_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
     """
     GET endpoint to fetch recommendations.
     Called directly from the browser or other services.
+    Pass `next_cursor` from the previous response as `cursor` for the next page.
     """
-    return await build_recommendations_payload(user_id)
+    return await serve_page(
+        "recommendations", user_id, limit, cursor, lambda: build_recommendations_payload(user_id)
+    )
 
 @app.post("/recommendations", response_model=RecommendationResponse)
 async def post_smart_suggestions(payload: RecommendationRequest):
     """
     POST endpoint to fetch recommendations.
-    Accepts a JSON body: {"user_id": "..."}
+    Accepts a JSON body: {"user_id": "...", "limit": 5, "cursor": null}
     """
     if not payload.user_id:
         raise HTTPException(status_code=400, detail="Missing user_id in request body.")
-    return await build_recommendations_payload(payload.user_id)
+    user_id = payload.user_id
+    return await serve_page(
+        "recommendations", user_id, payload.limit, payload.cursor,
+        lambda: build_recommendations_payload(user_id),
+    )
 
 @app.get("/explore/{user_id}", response_model=RecommendationResponse)
-async def get_explore(user_id: str):
-    return await build_explore_payload(user_id)
+async def get_explore(
+    user_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    return await serve_page("explore", user_id, limit, cursor, lambda: build_explore_payload(user_id))
 
 @app.post("/explore", response_model=RecommendationResponse)
 async def post_explore(payload: RecommendationRequest):
     if not payload.user_id:
         raise HTTPException(status_code=400, detail="Missing user_id in request body.")
-    return await build_explore_payload(payload.user_id)
+    user_id = payload.user_id
+    return await serve_page(
+        "explore", user_id, payload.limit, payload.cursor, lambda: build_explore_payload(user_id)
+    )
+
+
+@app.get("/health/memory")
+async def get_memory_usage():
+    """
+    Memory of the worker that served this request. `uss_kb` is the memory unique
+    to this worker; pages still shared with the preloading master are not in it.
+    """
+    return read_memory_usage()
 
 
 # --- 7. Run the App ---
 if __name__ == "__main__":
     """
-    This block allows you to run the app directly with `python main.py`
+    This block allows you to run the app directly with `python main.py`.
+    For several workers sharing one copy of the model, use
+    `gunicorn -c gunicorn.conf.py main:app` instead.
     """
     print("Starting FastAPI server at http://127.0.0.1:8000")
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
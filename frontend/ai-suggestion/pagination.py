@@ -0,0 +1,123 @@
+"""
+Cursor pagination for the recommendation and explore feeds.
+
+The first page computes the full ranked list once and parks it in a
+`RankedResultCache` for a short TTL, so later pages served by the same
+process are plain slices instead of new RPC / encode / ANN round trips.
+
+The cursor itself is self-contained: besides the cache token and offset it
+carries the ids of the remaining ranked books. A page requested from a
+different worker (or after the cache entry expired) is rebuilt from those
+ids with a single book lookup, without ranking again. Cursors are signed
+with HMAC-SHA256, so their contents can be trusted when they come back.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CURSOR_FIELDS = ("token", "offset", "kind", "user_id", "strategy", "is_fallback", "ids")
+SIGNATURE_BYTES = 16
+# A cursor holds at most one result pool of ids; refuse anything much larger,
+# before and after decompression
+MAX_CURSOR_LENGTH = 8192
+MAX_CURSOR_PAYLOAD_BYTES = 64 * 1024
+
+
+def _sign(key: bytes, payload: bytes) -> bytes:
+    return hmac.new(key, payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode_cursor(state: Dict[str, Any], key: bytes) -> str:
+    payload = zlib.compress(json.dumps(state, separators=(",", ":")).encode())
+    return base64.urlsafe_b64encode(_sign(key, payload) + payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: bytes) -> Dict[str, Any]:
+    """
+    Inverse of `encode_cursor`. Raises ValueError for anything malformed,
+    oversized, or not signed with `key`.
+    """
+    if len(cursor) > MAX_CURSOR_LENGTH:
+        raise ValueError("Malformed cursor.")
+    try:
+        raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode())
+    except (binascii.Error, ValueError) as e:
+        raise ValueError("Malformed cursor.") from e
+    signature, payload = raw[:SIGNATURE_BYTES], raw[SIGNATURE_BYTES:]
+    if not hmac.compare_digest(signature, _sign(key, payload)):
+        raise ValueError("Invalid cursor. Request the first page again.")
+    try:
+        decompressor = zlib.decompressobj()
+        data = decompressor.decompress(payload, MAX_CURSOR_PAYLOAD_BYTES)
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise ValueError("cursor payload too large or truncated")
+        state = json.loads(data)
+    except (zlib.error, ValueError) as e:
+        raise ValueError("Malformed cursor.") from e
+    if (
+        not isinstance(state, dict)
+        or any(field not in state for field in CURSOR_FIELDS)
+        or not isinstance(state["offset"], int)
+        or state["offset"] < 0
+        or not isinstance(state["ids"], list)
+    ):
+        raise ValueError("Malformed cursor.")
+    return state
+
+
+class RankedResultCache:
+    """
+    TTL cache of ranked feeds with one entry per (kind, user_id), so reloads
+    and coalesced requests replace that entry instead of adding new ones.
+    The token is kept while the ranking is unchanged, which keeps cursors
+    already handed out on the fast path. Every worker holds up to
+    `max_entries` values, so store compact ones (tuples, not response
+    models). Oldest entries are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, kind: str, user_id: str, value: Any) -> str:
+        self._evict_expired()
+        key = (kind, user_id)
+        entry = self._entries.pop(key, None)
+        token = entry[1] if entry is not None and entry[2] == value else secrets.token_urlsafe(9)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, token, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return token
+
+    def get(self, token: str, kind: str, user_id: str) -> Optional[Any]:
+        key = (kind, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, entry_token, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        if entry_token != token:
+            return None
+        return value
+
+    def _evict_expired(self) -> None:
+        # Entries are (re)inserted in expiry order, so expired ones are at the front
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at >= now:
+                break
+            del self._entries[key]
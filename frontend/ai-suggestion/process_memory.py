@@ -0,0 +1,49 @@
+"""
+Per-process memory figures, used to check how much of a worker's memory is
+really its own when several workers share pages with a preloaded master.
+"""
+import os
+import resource
+from typing import Dict
+
+SMAPS_FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb",
+}
+
+
+def read_memory_usage() -> Dict[str, int]:
+    """
+    Returns memory usage of the current process in kB.
+
+    On Linux this comes from /proc/self/smaps_rollup, and `uss_kb` (unique set
+    size: private clean + private dirty pages) is what this process would free
+    if it exited; pages still shared copy-on-write with the master are not in it.
+    Elsewhere only the peak RSS is available.
+    """
+    usage: Dict[str, int] = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in SMAPS_FIELDS:
+                    usage[SMAPS_FIELDS[name]] = int(rest.split()[0])
+    except OSError:
+        usage["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage
+    usage["uss_kb"] = usage.get("private_clean_kb", 0) + usage.get("private_dirty_kb", 0)
+    return usage
+
+
+def format_memory_usage(usage: Dict[str, int]) -> str:
+    if "uss_kb" not in usage:
+        return f"pid {usage['pid']}: max RSS {usage['max_rss_kb'] / 1024:.1f} MB"
+    return (
+        f"pid {usage['pid']}: RSS {usage.get('rss_kb', 0) / 1024:.1f} MB, "
+        f"PSS {usage.get('pss_kb', 0) / 1024:.1f} MB, "
+        f"unique {usage['uss_kb'] / 1024:.1f} MB"
+    )
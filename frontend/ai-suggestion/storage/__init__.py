@@ -0,0 +1,97 @@
+"""
+Storage backends for the recommendation service.
+
+`BookStore` lists exactly the queries main.py, ingest.py and
+import_catalog.py need. Two implementations exist:
+
+- SupabaseStore (default): the hosted Postgres project, via supabase-py.
+- SQLiteStore: a local database file, for single-node deployments and
+  hermetic load tests.
+
+Pick one with STORAGE_BACKEND=supabase|sqlite (see `create_store`).
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+# Columns returned for every book in a recommendation response
+BOOK_SUMMARY_COLUMNS = ("id", "title", "author", "cover_image")
+# Columns the catalog importer writes
+BOOK_WRITE_COLUMNS = (
+    "id", "title", "author", "description", "genre", "genres", "language",
+    "cover_image", "pdf_file", "number_of_downloads",
+)
+# Columns the genre index and the embedding ingestion need. number_of_downloads
+# is optional: catalogs without that column are read without it.
+CATALOG_COLUMNS = (
+    "id", "title", "author", "genre", "genres", "cover_image", "number_of_downloads",
+)
+
+
+class BookStore(ABC):
+    """Read access to books, profiles and reading history, plus bulk catalog writes."""
+
+    @abstractmethod
+    def get_user_history(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Every book the user has interacted with, most recent first, with
+        `book_id`, `scroll_depth`, `rating` and `was_in_watchlist`.
+        """
+
+    @abstractmethod
+    def get_read_book_ids(self, user_id: str) -> Set[Any]:
+        """Ids of every book in the user's `user_books` rows."""
+
+    @abstractmethod
+    def get_user_genres(self, user_id: str) -> Optional[List[str]]:
+        """The user's saved genre preferences, or None if they have none."""
+
+    @abstractmethod
+    def get_books(self, book_ids: List[Any], with_details: bool = False) -> List[Dict[str, Any]]:
+        """
+        Books with the given ids (order not guaranteed). Summary columns only,
+        unless `with_details` also asks for `genres` and `language`.
+        """
+
+    @abstractmethod
+    def get_popular_books(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most downloaded books, summary columns only."""
+
+    @abstractmethod
+    def get_top_books(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Explore candidates: by number_of_downloads, or by newest if the
+        catalog has no download counts.
+        """
+
+    @abstractmethod
+    def iter_catalog(self, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yields the whole catalog (CATALOG_COLUMNS) in pages ordered by id.
+        Rows lack `number_of_downloads` if the catalog has no such column.
+        """
+
+    @abstractmethod
+    def upsert_books(self, books: List[Dict[str, Any]]) -> None:
+        """
+        Inserts or updates a batch of books (BOOK_WRITE_COLUMNS) in one round
+        trip, keyed on `id`.
+        """
+
+
+def create_store() -> BookStore:
+    """Builds the store selected by the STORAGE_BACKEND environment variable."""
+    backend = os.environ.get("STORAGE_BACKEND", "supabase").lower()
+    if backend == "sqlite":
+        from storage.sqlite_store import SQLiteStore
+
+        return SQLiteStore(os.environ.get("SQLITE_PATH", "nextchapter.db"))
+    if backend == "supabase":
+        from storage.supabase_store import SupabaseStore
+
+        url = os.environ.get("SUPABASE_URL")
+        key = os.environ.get("SUPABASE_SERVICE_KEY")
+        if not url or not key:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY are required for the supabase storage backend.")
+        return SupabaseStore(url, key)
+    raise RuntimeError(f"Unknown STORAGE_BACKEND '{backend}'. Use 'supabase' or 'sqlite'.")
@@ -0,0 +1,219 @@
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from storage import BOOK_WRITE_COLUMNS, BookStore
+
+# Mirrors the Supabase tables the service reads. Genres live in a join table
+# (book_genres) so they can be indexed, instead of a Postgres text[] column.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    description TEXT,
+    genre TEXT,
+    cover_image TEXT,
+    pdf_file TEXT,
+    language TEXT,
+    number_of_downloads INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_books_downloads ON books (number_of_downloads DESC);
+
+CREATE TABLE IF NOT EXISTS book_genres (
+    book_id TEXT NOT NULL REFERENCES books (id) ON DELETE CASCADE,
+    genre TEXT NOT NULL,
+    PRIMARY KEY (book_id, genre)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_book_genres_genre ON book_genres (genre, book_id);
+
+CREATE TABLE IF NOT EXISTS user_profiles (
+    user_id TEXT PRIMARY KEY,
+    genres TEXT -- JSON array of genre names
+);
+
+CREATE TABLE IF NOT EXISTS user_books (
+    user_id TEXT NOT NULL,
+    book_id TEXT NOT NULL,
+    current_page INTEGER,
+    progress_percentage REAL,
+    status TEXT,
+    completed_at TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (user_id, book_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_books_recent ON user_books (user_id, updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS book_ratings (
+    user_id TEXT NOT NULL,
+    book_id TEXT NOT NULL,
+    rating INTEGER,
+    rated_at TEXT,
+    PRIMARY KEY (user_id, book_id)
+);
+
+CREATE TABLE IF NOT EXISTS book_wishlist (
+    user_id TEXT NOT NULL,
+    book_id TEXT NOT NULL,
+    created_at TEXT,
+    PRIMARY KEY (user_id, book_id)
+);
+"""
+
+# Every query is a fixed string with bound parameters, so sqlite3's per-connection
+# statement cache compiles each one once. Id lists are passed as a single JSON
+# array (json_each) to keep IN (...) queries to one cached statement as well.
+SQL_USER_HISTORY = """
+SELECT ub.book_id,
+       ub.progress_percentage AS scroll_depth,
+       r.rating,
+       w.book_id IS NOT NULL AS was_in_watchlist
+FROM user_books ub
+LEFT JOIN book_ratings r ON r.user_id = ub.user_id AND r.book_id = ub.book_id
+LEFT JOIN book_wishlist w ON w.user_id = ub.user_id AND w.book_id = ub.book_id
+WHERE ub.user_id = ?
+ORDER BY ub.updated_at DESC
+"""
+SQL_READ_BOOK_IDS = "SELECT book_id FROM user_books WHERE user_id = ?"
+SQL_USER_GENRES = "SELECT genres FROM user_profiles WHERE user_id = ?"
+SQL_BOOKS_SUMMARY = """
+SELECT id, title, author, cover_image
+FROM books
+WHERE id IN (SELECT value FROM json_each(?))
+"""
+SQL_BOOKS_DETAILS = """
+SELECT id, title, author, cover_image, language,
+       (SELECT json_group_array(g.genre) FROM book_genres g WHERE g.book_id = b.id) AS genres
+FROM books b
+WHERE id IN (SELECT value FROM json_each(?))
+"""
+SQL_POPULAR_BOOKS = """
+SELECT id, title, author, cover_image
+FROM books
+ORDER BY number_of_downloads DESC, created_at DESC
+LIMIT ?
+"""
+SQL_CATALOG_PAGE = """
+SELECT id, title, author, genre, cover_image, number_of_downloads,
+       (SELECT json_group_array(g.genre) FROM book_genres g WHERE g.book_id = b.id) AS genres
+FROM books b
+ORDER BY id
+LIMIT ? OFFSET ?
+"""
+SQL_UPSERT_BOOK = """
+INSERT INTO books (id, title, author, description, genre, language, cover_image, pdf_file, number_of_downloads)
+VALUES (:id, :title, :author, :description, :genre, :language, :cover_image, :pdf_file, :number_of_downloads)
+ON CONFLICT (id) DO UPDATE SET
+    title = excluded.title,
+    author = excluded.author,
+    description = excluded.description,
+    genre = excluded.genre,
+    language = excluded.language,
+    cover_image = excluded.cover_image,
+    pdf_file = excluded.pdf_file,
+    number_of_downloads = excluded.number_of_downloads
+"""
+SQL_DELETE_BOOK_GENRES = "DELETE FROM book_genres WHERE book_id = ?"
+SQL_INSERT_BOOK_GENRE = "INSERT OR IGNORE INTO book_genres (book_id, genre) VALUES (?, ?)"
+
+
+class SQLiteStore(BookStore):
+    """
+    BookStore backed by a local SQLite file. Each thread gets its own
+    connection (the service calls the store from a thread pool).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        # Databases created before books.pdf_file existed
+        if "pdf_file" not in {row["name"] for row in conn.execute("PRAGMA table_info(books)")}:
+            conn.execute("ALTER TABLE books ADD COLUMN pdf_file TEXT")
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.connection().execute(sql, params)]
+
+    @staticmethod
+    def _decode_genres(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for row in rows:
+            row["genres"] = json.loads(row["genres"]) if row.get("genres") else []
+        return rows
+
+    def get_user_history(self, user_id: str) -> List[Dict[str, Any]]:
+        rows = self._rows(SQL_USER_HISTORY, (user_id,))
+        for row in rows:
+            row["was_in_watchlist"] = bool(row["was_in_watchlist"])
+        return rows
+
+    def get_read_book_ids(self, user_id: str) -> Set[Any]:
+        return {row[0] for row in self.connection().execute(SQL_READ_BOOK_IDS, (user_id,))}
+
+    def get_user_genres(self, user_id: str) -> Optional[List[str]]:
+        row = self.connection().execute(SQL_USER_GENRES, (user_id,)).fetchone()
+        if row is None or not row[0]:
+            return None
+        return json.loads(row[0]) or None
+
+    def get_books(self, book_ids: List[Any], with_details: bool = False) -> List[Dict[str, Any]]:
+        if not book_ids:
+            return []
+        ids = json.dumps([str(book_id) for book_id in book_ids])
+        if with_details:
+            return self._decode_genres(self._rows(SQL_BOOKS_DETAILS, (ids,)))
+        return self._rows(SQL_BOOKS_SUMMARY, (ids,))
+
+    def get_popular_books(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return self._rows(SQL_POPULAR_BOOKS, (limit,))
+
+    def get_top_books(self, limit: int) -> List[Dict[str, Any]]:
+        # number_of_downloads is NOT NULL here, newest first breaks ties
+        return self._rows(SQL_POPULAR_BOOKS, (limit,))
+
+    def iter_catalog(self, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        offset = 0
+        while True:
+            rows = self._decode_genres(self._rows(SQL_CATALOG_PAGE, (page_size, offset)))
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            offset += page_size
+
+    def upsert_books(self, books: List[Dict[str, Any]]) -> None:
+        if not books:
+            return
+        rows = [
+            {column: book.get(column) for column in BOOK_WRITE_COLUMNS if column != "genres"}
+            for book in books
+        ]
+        for row in rows:
+            row["id"] = str(row["id"])
+            row["number_of_downloads"] = row["number_of_downloads"] or 0
+        conn = self.connection()
+        with conn:
+            conn.executemany(SQL_UPSERT_BOOK, rows)
+            conn.executemany(SQL_DELETE_BOOK_GENRES, [(row["id"],) for row in rows])
+            conn.executemany(
+                SQL_INSERT_BOOK_GENRE,
+                [
+                    (str(book["id"]), genre)
+                    for book in books
+                    for genre in (book.get("genres") or [])
+                    if genre
+                ],
+            )
@@ -0,0 +1,142 @@
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from postgrest.exceptions import APIError
+from supabase import Client, create_client
+
+from storage import BOOK_SUMMARY_COLUMNS, CATALOG_COLUMNS, BookStore
+
+SUMMARY_SELECT = ", ".join(BOOK_SUMMARY_COLUMNS)
+
+
+class SupabaseStore(BookStore):
+    """BookStore backed by the Supabase project (service_role key, bypasses RLS)."""
+
+    def __init__(self, url: str, service_key: str) -> None:
+        self.client: Client = create_client(url, service_key)
+
+    def get_user_history(self, user_id: str) -> List[Dict[str, Any]]:
+        # One RPC joins user_books, book_ratings and book_wishlist, pre-sorted by recency
+        response = self.client.rpc("get_full_user_history", {"p_user_id": user_id}).execute()
+        return response.data or []
+
+    def get_read_book_ids(self, user_id: str) -> Set[Any]:
+        response = (
+            self.client.table("user_books")
+            .select("book_id")
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return {
+            row.get("book_id")
+            for row in (response.data or [])
+            if row.get("book_id") is not None
+        }
+
+    def get_user_genres(self, user_id: str) -> Optional[List[str]]:
+        try:
+            response = (
+                self.client.table("user_profiles")
+                .select("genres")
+                .eq("user_id", user_id)
+                .maybe_single()
+                .execute()
+            )
+        except APIError as e:
+            if e.code == "PGRST116":
+                return None
+            raise
+        if not response or not response.data:
+            return None
+        return response.data.get("genres") or None
+
+    def get_books(self, book_ids: List[Any], with_details: bool = False) -> List[Dict[str, Any]]:
+        if not book_ids:
+            return []
+        columns = "id, title, author, cover_image, genres, language" if with_details else SUMMARY_SELECT
+        response = (
+            self.client.table("books")
+            .select(columns)
+            .in_("id", book_ids)
+            .execute()
+        )
+        return response.data or []
+
+    def get_popular_books(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Tries the PostgreSQL RPC 'get_popular_books' first. If that fails,
+        runs a manual query ordered by 'number_of_downloads'.
+        """
+        try:
+            response = self.client.rpc("get_popular_books", {}).execute()
+            if response.data:
+                return response.data[:limit]
+            print("RPC 'get_popular_books' returned no data. Using fallback query.")
+        except APIError as e:
+            # This catches errors if the RPC function doesn't exist or fails
+            if e.code == "PGRST202" or e.code == "42883" or e.code == "42703":
+                print(f"RPC 'get_popular_books' failed or not found ({e.code}). Using fallback query.")
+            else:
+                print(f"Error calling get_popular_books RPC: {e}")
+        except Exception as e:
+            print(f"A general error occurred in get_popular_books: {e}")
+
+        # Manual fallback query if the RPC fails
+        response = (
+            self.client.table("books")
+            .select(SUMMARY_SELECT)
+            .order("number_of_downloads", desc=True, nullsfirst=False)
+            .limit(limit)
+            .execute()
+        )
+        return response.data or []
+
+    def get_top_books(self, limit: int) -> List[Dict[str, Any]]:
+        try:
+            response = (
+                self.client.table("books")
+                .select(SUMMARY_SELECT)
+                .order("number_of_downloads", desc=True, nullsfirst=False)
+                .limit(limit)
+                .execute()
+            )
+        except APIError as e:
+            if e.code != "42703":
+                raise
+            # Fallback to created_at if number_of_downloads column does not exist
+            response = (
+                self.client.table("books")
+                .select(SUMMARY_SELECT)
+                .order("created_at", desc=True, nullsfirst=False)
+                .limit(limit)
+                .execute()
+            )
+        return response.data or []
+
+    def iter_catalog(self, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        columns = CATALOG_COLUMNS
+        start = 0
+        while True:
+            try:
+                response = (
+                    self.client.table("books")
+                    .select(", ".join(columns))
+                    .order("id")
+                    .range(start, start + page_size - 1)
+                    .execute()
+                )
+            except APIError as e:
+                if e.code != "42703" or "number_of_downloads" not in columns:
+                    raise
+                # number_of_downloads column does not exist; read the catalog without it
+                columns = tuple(c for c in CATALOG_COLUMNS if c != "number_of_downloads")
+                continue
+            rows = response.data or []
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            start += page_size
+
+    def upsert_books(self, books: List[Dict[str, Any]]) -> None:
+        if books:
+            self.client.table("books").upsert(books, on_conflict="id").execute()
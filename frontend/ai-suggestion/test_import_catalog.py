@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from import_catalog import iter_json_array
+
+CHUNK_SIZES = [1, 2, 3, 1 << 16]
+
+
+def write_dump(tmp_path, text: str) -> str:
+    path = tmp_path / "dump.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize(
+    "text",
+    [
+        "[]",
+        " [ ] \n",
+        "[1, 2]",
+        "[12345, 1.5e3, -0.25]",
+        '[{"id": "a", "tags": ["x", "y"]}, "s,]t", true, null]',
+        '\n[\n  {"id": 1},\n  {"id": 2}\n]\n',
+    ],
+)
+def test_yields_the_same_elements_as_json_loads(tmp_path, chunk_size, text):
+    path = write_dump(tmp_path, text)
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "{}",
+        "[1 2]",
+        "[1,,2]",
+        "[,1]",
+        "[1,2,]",
+        "[1,2]trailing",
+        "[1,2] [3]",
+        "[1,2",
+        '[{"id": 1}',
+        '[{"id": }]',
+    ],
+)
+def test_rejects_malformed_arrays(tmp_path, chunk_size, text):
+    path = write_dump(tmp_path, text)
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, chunk_size=chunk_size))
+
+
+def test_rejects_elements_over_the_size_limit(tmp_path):
+    path = write_dump(tmp_path, '[{"title": "' + "x" * 100 + '"}]')
+    with pytest.raises(ValueError, match="longer than"):
+        list(iter_json_array(path, chunk_size=8, max_element_size=32))
@@ -23,6 +23,8 @@ const Reader = () => {
   const viewerRef = useRef(null);
   const pdfUrlRef = useRef('');
   const messagesEndRef = useRef(null);
+  // Server-issued id of this book's chat, so the backend remembers the conversation
+  const chatSessionIdRef = useRef('');
 
   const {
     loadPdf,
@@ -219,7 +221,8 @@ const Reader = () => {
           message: message,
           book_title: bookTitle,
           current_page: currentPage,
-          total_pages: totalPages
+          total_pages: totalPages,
+          session_id: chatSessionIdRef.current
         })
       });
       
@@ -233,6 +236,9 @@ const Reader = () => {
       }
       
       const data = await response.json();
+      if (data.session_id) {
+        chatSessionIdRef.current = data.session_id;
+      }
       const aiResponse = data.response || 'Sorry, I could not generate a response.';
       setMessages(prev => [...prev, { role: 'ai', text: aiResponse }]);
     } catch (error) {